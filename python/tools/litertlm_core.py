@@ -32,15 +32,42 @@ K_LLM_METADATA_SECTION_NAME = "llm_metadata"
 K_BINARY_DATA_SECTION_NAME = "binary_data"
 K_HF_TOKENIZER_ZLIB_SECTION_NAME = "hf_tokenizer_zlib"
 
+# Reverse mapping from the AnySectionDataType integer values to their names.
+_ANY_SECTION_TYPE_NAMES = {
+    int(v): k
+    for k, v in vars(schema.AnySectionDataType).items()
+    if not k.startswith("_") and isinstance(v, int)
+}
+
+# Mapping from file extension to the section type and name it is stored as.
+_EXT_TO_SECTION = {
+    ".tflite": (schema.AnySectionDataType.TFLiteModel, K_TFLITE_SECTION_NAME),
+    ".pb": (
+        schema.AnySectionDataType.LlmMetadataProto,
+        K_LLM_METADATA_SECTION_NAME,
+    ),
+    ".proto": (
+        schema.AnySectionDataType.LlmMetadataProto,
+        K_LLM_METADATA_SECTION_NAME,
+    ),
+    ".pbtext": (
+        schema.AnySectionDataType.LlmMetadataProto,
+        K_LLM_METADATA_SECTION_NAME,
+    ),
+    ".prototext": (
+        schema.AnySectionDataType.LlmMetadataProto,
+        K_LLM_METADATA_SECTION_NAME,
+    ),
+    ".spiece": (
+        schema.AnySectionDataType.SP_Tokenizer,
+        K_TOKENIZER_SECTION_NAME,
+    ),
+}
+
 
 def any_section_data_type_to_string(data_type):
   """Converts AnySectionDataType enum to its string representation."""
-  # Create a reverse mapping from the enum's integer values to names
-  if not hasattr(any_section_data_type_to_string, "map"):
-    any_section_data_type_to_string.map = {
-        v: k for k, v in schema.AnySectionDataType.__dict__.items()
-    }
-  return any_section_data_type_to_string.map.get(
+  return _ANY_SECTION_TYPE_NAMES.get(
       data_type, f"Unknown AnySectionDataType value ({data_type})"
   )
 
@@ -52,23 +79,12 @@ def get_file_extension(filename):
 
 def get_section_type_and_name(filename):
   """Determines the section type and name from the filename."""
-  ext = get_file_extension(filename)
-  if ext == ".tflite":
-    return schema.AnySectionDataType.TFLiteModel, K_TFLITE_SECTION_NAME
-  elif ext in (".pb", ".proto", ".pbtext", ".prototext"):
-    return (
-        schema.AnySectionDataType.LlmMetadataProto,
-        K_LLM_METADATA_SECTION_NAME,
-    )
-  elif ext == ".spiece":
-    return schema.AnySectionDataType.SP_Tokenizer, K_TOKENIZER_SECTION_NAME
-  elif filename.endswith("tokenizer.json"):
+  if filename.endswith("tokenizer.json"):
     return (
         schema.AnySectionDataType.HF_Tokenizer_Zlib,
         K_HF_TOKENIZER_ZLIB_SECTION_NAME,
     )
-  else:
-    return (
-        schema.AnySectionDataType.GenericBinaryData,
-        K_BINARY_DATA_SECTION_NAME,
-    )
+  return _EXT_TO_SECTION.get(
+      get_file_extension(filename),
+      (schema.AnySectionDataType.GenericBinaryData, K_BINARY_DATA_SECTION_NAME),
+  )
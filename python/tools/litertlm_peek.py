@@ -13,6 +13,11 @@
 
 """Library for inspecting the contents of a LiteRT-LM file."""
 
+import contextlib
+import functools
+import io
+import mmap
+import os
 import struct
 from google.protobuf import text_format
 from litert_lm.python.tools import litertlm_core
@@ -22,181 +27,260 @@ from litert_lm.schema.core import litertlm_header_schema_py_generated as schema
 # --- ANSI Escape Code Definitions ---
 ANSI_BOLD = "\033[1m"
 ANSI_RESET = "\033[0m"
+# --- Header Layout ---
+# Version (major, minor, patch), padding, then the header end offset.
+_HEADER_PREFIX_STRUCT = struct.Struct("<III4xQ")
 # --- Indentation Constants ---
 INDENT_SPACES = 2
 
 
+def _decode_string_value(value_obj):
+  """Decodes the UTF-8 payload of a StringValue table."""
+  value_bytes = value_obj.Value()
+  return value_bytes.decode("utf-8") if value_bytes is not None else None
+
+
+# Maps each VData union type to its table class, display label and formatter.
+_VDATA_DISPATCH = {
+    schema.VData.StringValue: (
+        schema.StringValue,
+        "String",
+        _decode_string_value,
+    ),
+    schema.VData.UInt8: (schema.UInt8, "UInt8", lambda v: v.Value()),
+    schema.VData.Int8: (schema.Int8, "Int8", lambda v: v.Value()),
+    schema.VData.UInt16: (schema.UInt16, "UInt16", lambda v: v.Value()),
+    schema.VData.Int16: (schema.Int16, "Int16", lambda v: v.Value()),
+    schema.VData.UInt32: (schema.UInt32, "UInt32", lambda v: v.Value()),
+    schema.VData.Int32: (schema.Int32, "Int32", lambda v: v.Value()),
+    schema.VData.UInt64: (schema.UInt64, "UInt64", lambda v: v.Value()),
+    schema.VData.Int64: (schema.Int64, "Int64", lambda v: v.Value()),
+    schema.VData.Double: (
+        schema.Double,
+        "Double",
+        lambda v: f"{v.Value():.4f}",
+    ),
+    schema.VData.Bool: (schema.Bool, "Bool", lambda v: bool(v.Value())),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _box_border(box_width):
+  """Returns the top/bottom border line of a box of the given width."""
+  return "+" + "-" * (box_width - 2) + "+"
+
+
 def print_boxed_title(os, title, box_width=50):
   """Prints a title surrounded by an ASCII box."""
-  top_bottom = "+" + "-" * (box_width - 2) + "+"
-  padding_left = (box_width - 2 - len(title)) // 2
-  padding_right = box_width - 2 - len(title) - padding_left
-  middle = "|" + " " * padding_left + title + " " * padding_right + "|"
-  os.write(f"{top_bottom}\n{middle}\n{top_bottom}\n")
+  top_bottom = _box_border(box_width)
+  # The "^" format centers with any odd padding space on the right.
+  os.write(f"{top_bottom}\n|{title:^{box_width - 2}}|\n{top_bottom}\n")
+
 
+def print_key_value_pair(
+    kvp, output_stream, indent_level, key_label="Key", value_label="Value"
+):
+  """Prints a formatted KeyValuePair.
 
-def print_key_value_pair(kvp, output_stream, indent_level):
-  """Prints a formatted KeyValuePair."""
+  Args:
+    kvp: The KeyValuePair to print.
+    output_stream: The stream to write to.
+    indent_level: The indentation level of the printed line.
+    key_label: The label printed before the key. Callers pass a pre-formatted
+      label, e.g. wrapped in ANSI bold codes when writing to a TTY.
+    value_label: The label printed before the value.
+  """
   indent_str = " " * (indent_level * INDENT_SPACES)
   if not kvp:
     output_stream.write(f"{indent_str}KeyValuePair: nullptr\n")
     return
 
-  use_color = hasattr(output_stream, "isatty") and output_stream.isatty()
-  bold = ANSI_BOLD if use_color else ""
-  reset = ANSI_RESET if use_color else ""
-
   key_bytes = kvp.Key()
   key = key_bytes.decode("utf-8") if key_bytes is not None else None
-  output_stream.write(f"{indent_str}{bold}Key{reset}: {key}, ")
+  output_stream.write(f"{indent_str}{key_label}: {key}, ")
 
   value_type = kvp.ValueType()
   union_table = kvp.Value()
 
   if union_table is None:
-    output_stream.write(f"{bold}Value{reset}: <null>\n")
+    output_stream.write(f"{value_label}: <null>\n")
     return
 
-  if value_type == schema.VData.StringValue:
-    value_obj = schema.StringValue()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    value_bytes = value_obj.Value()
-    value = value_bytes.decode("utf-8") if value_bytes is not None else None
-    output_stream.write(f"{bold}Value{reset} (String): {value}\n")
-  elif value_type == schema.VData.UInt8:
-    value_obj = schema.UInt8()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (UInt8): {value_obj.Value()}\n")
-  elif value_type == schema.VData.Int8:
-    value_obj = schema.Int8()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (Int8): {value_obj.Value()}\n")
-  elif value_type == schema.VData.UInt16:
-    value_obj = schema.UInt16()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (UInt16): {value_obj.Value()}\n")
-  elif value_type == schema.VData.Int16:
-    value_obj = schema.Int16()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (Int16): {value_obj.Value()}\n")
-  elif value_type == schema.VData.UInt32:
-    value_obj = schema.UInt32()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (UInt32): {value_obj.Value()}\n")
-  elif value_type == schema.VData.Int32:
-    value_obj = schema.Int32()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (Int32): {value_obj.Value()}\n")
-  elif value_type == schema.VData.UInt64:
-    value_obj = schema.UInt64()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (UInt64): {value_obj.Value()}\n")
-  elif value_type == schema.VData.Int64:
-    value_obj = schema.Int64()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(f"{bold}Value{reset} (Int64): {value_obj.Value()}\n")
-  elif value_type == schema.VData.Double:
-    value_obj = schema.Double()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(
-        f"{bold}Value{reset} (Double): {value_obj.Value():.4f}\n"
+  entry = _VDATA_DISPATCH.get(value_type)
+  if entry is None:
+    output_stream.write(f"{value_label} (Unknown Type)\n")
+    return
+  value_cls, type_label, format_value = entry
+  value_obj = value_cls()
+  value_obj.Init(union_table.Bytes, union_table.Pos)
+  output_stream.write(
+      f"{value_label} ({type_label}): {format_value(value_obj)}\n"
+  )
+
+
+def _read_header_prefix(data, output_stream):
+  """Validates the fixed-size prefix of a LiteRT-LM file.
+
+  Args:
+    data: The contents of the LiteRT-LM file as a bytes-like object.
+    output_stream: The stream to write the file version to.
+
+  Returns:
+    The end offset of the header, which starts at
+    litertlm_core.HEADER_BEGIN_BYTE_OFFSET.
+  """
+  magic = data[:8]
+  if magic != b"LITERTLM":
+    raise ValueError(f"Invalid magic number: {magic}")
+  if len(data) < litertlm_core.HEADER_BEGIN_BYTE_OFFSET:
+    raise ValueError(f"File is too short for a LiteRT-LM header: {len(data)}")
+
+  # The fixed-size prefix after the magic number holds the version and the
+  # header end offset.
+  major, minor, patch, header_end_offset = _HEADER_PREFIX_STRUCT.unpack_from(
+      data, len(magic)
+  )
+  output_stream.write(f"LiteRT-LM Version: {major}.{minor}.{patch}\n\n")
+
+  if header_end_offset < litertlm_core.HEADER_BEGIN_BYTE_OFFSET:
+    raise ValueError(
+        f"Header end offset {header_end_offset} is before the header begin"
+        f" offset {litertlm_core.HEADER_BEGIN_BYTE_OFFSET}."
     )
-  elif value_type == schema.VData.Bool:
-    value_obj = schema.Bool()
-    value_obj.Init(union_table.Bytes, union_table.Pos)
-    output_stream.write(
-        f"{bold}Value{reset} (Bool): {bool(value_obj.Value())}\n"
+  if header_end_offset > len(data):
+    raise ValueError(
+        f"Header end offset {header_end_offset} exceeds file size {len(data)}."
     )
-  else:
-    output_stream.write(f"{bold}Value{reset} (Unknown Type)\n")
+  return header_end_offset
 
 
-def read_litertlm_header(file_path, output_stream):
-  """Reads the header of a LiteRT-LM file and returns the metadata."""
-  with open(file_path, "rb") as f:
-    magic = f.read(8)
-    if magic != b"LITERTLM":
-      raise ValueError(f"Invalid magic number: {magic}")
+def read_litertlm_header(data, output_stream):
+  """Reads the header of a LiteRT-LM file and returns the metadata.
 
-    major, minor, patch = struct.unpack("<III", f.read(12))
-    output_stream.write(f"LiteRT-LM Version: {major}.{minor}.{patch}\n\n")
+  Args:
+    data: The contents of the LiteRT-LM file as a bytes-like object.
+    output_stream: The stream to write the file version to.
 
-    f.seek(litertlm_core.HEADER_END_LOCATION_BYTE_OFFSET)
-    header_end_offset = struct.unpack("<Q", f.read(8))[0]
+  Returns:
+    The LiteRT-LM header metadata.
+  """
+  header_end_offset = _read_header_prefix(data, output_stream)
+  return schema.LiteRTLMMetaData.GetRootAs(
+      data[litertlm_core.HEADER_BEGIN_BYTE_OFFSET : header_end_offset], 0
+  )
 
-    f.seek(litertlm_core.HEADER_BEGIN_BYTE_OFFSET)
-    header_data = f.read(
-        header_end_offset - litertlm_core.HEADER_BEGIN_BYTE_OFFSET
-    )
 
-    metadata = schema.LiteRTLMMetaData.GetRootAs(header_data, 0)
-    return metadata
+@contextlib.contextmanager
+def _header_view(data, output_stream):
+  """Validates the prefix of `data` and yields a view of its header.
+
+  The view is not a copy, and is limited to the header so a corrupt header
+  cannot be parsed past its end. It is released on exit, so that `data` can
+  be closed afterwards if it is a memory map.
+
+  Args:
+    data: The contents of the LiteRT-LM file as a bytes-like object.
+    output_stream: The stream to write the file version to.
+
+  Yields:
+    A memoryview of the header.
+  """
+  header_end_offset = _read_header_prefix(data, output_stream)
+  with memoryview(data)[
+      litertlm_core.HEADER_BEGIN_BYTE_OFFSET : header_end_offset
+  ] as header:
+    yield header
+
+
+def _map_file(f):
+  """Returns a context manager for the contents of `f` as a buffer.
+
+  The file is memory-mapped. Empty files cannot be mapped, so files too short
+  to hold a header are read instead, for `_read_header_prefix` to reject.
+
+  Args:
+    f: The file object, opened for binary reading.
+  """
+  if os.fstat(f.fileno()).st_size < litertlm_core.HEADER_BEGIN_BYTE_OFFSET:
+    return contextlib.nullcontext(f.read())
+  return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 
 def peek_litertlm_file(litertlm_path, output_stream):
   """Reads and prints information from a LiteRT-LM file."""
-  metadata = read_litertlm_header(litertlm_path, output_stream)
-  with open(litertlm_path, "rb") as f:
+  use_color = hasattr(output_stream, "isatty") and output_stream.isatty()
+  bold = ANSI_BOLD if use_color else ""
+  reset = ANSI_RESET if use_color else ""
+  key_label = f"{bold}Key{reset}"
+  value_label = f"{bold}Value{reset}"
+  indent1 = " " * INDENT_SPACES
+  indent2 = " " * (2 * INDENT_SPACES)
+
+  # Everything is formatted into an in-memory buffer and handed to
+  # output_stream in a single write.
+  out = io.StringIO()
+  with open(litertlm_path, "rb") as f, _map_file(f) as mm, _header_view(
+      mm, out
+  ) as header:
+    # FlatBuffers offsets are relative, so the root table is read in place.
+    metadata = schema.LiteRTLMMetaData.GetRootAs(header, 0)
 
     # Print System Metadata
     system_metadata = metadata.SystemMetadata()
-    print_boxed_title(output_stream, "System Metadata")
+    print_boxed_title(out, "System Metadata")
     if system_metadata and system_metadata.EntriesLength() > 0:
       for i in range(system_metadata.EntriesLength()):
-        print_key_value_pair(system_metadata.Entries(i), output_stream, 1)
+        print_key_value_pair(
+            system_metadata.Entries(i), out, 1, key_label, value_label
+        )
     else:
-      output_stream.write(" " * INDENT_SPACES + "No system metadata entries.\n")
-    output_stream.write("\n")
+      out.write(indent1 + "No system metadata entries.\n")
+    out.write("\n")
 
     # Print Section Metadata
     section_metadata = metadata.SectionMetadata()
     num_sections = section_metadata.ObjectsLength() if section_metadata else 0
-    print_boxed_title(output_stream, f"Sections ({num_sections})")
+    print_boxed_title(out, f"Sections ({num_sections})")
 
     if num_sections == 0 or section_metadata is None:
-      output_stream.write(" " * INDENT_SPACES + "<None>\n")
+      out.write(indent1 + "<None>\n")
     else:
-      use_color = hasattr(output_stream, "isatty") and output_stream.isatty()
-      bold = ANSI_BOLD if use_color else ""
-      reset = ANSI_RESET if use_color else ""
       for i in range(num_sections):
         sec_obj = section_metadata.Objects(i)
-        output_stream.write(f"\n{bold}Section {i}:{reset}\n")
-        output_stream.write(" " * INDENT_SPACES + "Items:\n")
+        out.write(f"\n{bold}Section {i}:{reset}\n{indent1}Items:\n")
         if sec_obj is None:
-          output_stream.write(" " * INDENT_SPACES + "<None>\n")
+          out.write(indent1 + "<None>\n")
           continue
 
         # Print the items in the section.
-        if sec_obj.ItemsLength() > 0:
-          for j in range(sec_obj.ItemsLength()):
-            print_key_value_pair(sec_obj.Items(j), output_stream, 2)
+        num_items = sec_obj.ItemsLength()
+        if num_items > 0:
+          for j in range(num_items):
+            print_key_value_pair(
+                sec_obj.Items(j), out, 2, key_label, value_label
+            )
         else:
-          output_stream.write(" " * (2 * INDENT_SPACES) + "<None>\n")
+          out.write(indent2 + "<None>\n")
 
-        output_stream.write(
-            f"{' ' * INDENT_SPACES}Begin Offset: {sec_obj.BeginOffset()}\n"
-        )
-        output_stream.write(
-            f"{' ' * INDENT_SPACES}End Offset:   {sec_obj.EndOffset()}\n"
-        )
-        output_stream.write(
-            f"{' ' * INDENT_SPACES}Data Type:    "
-            f"{litertlm_core.any_section_data_type_to_string(sec_obj.DataType())}\n"
+        begin = sec_obj.BeginOffset()
+        end = sec_obj.EndOffset()
+        data_type = sec_obj.DataType()
+        out.write(
+            f"{indent1}Begin Offset: {begin}\n"
+            f"{indent1}End Offset:   {end}\n"
+            f"{indent1}Data Type:    "
+            f"{litertlm_core.any_section_data_type_to_string(data_type)}\n"
         )
 
-        if sec_obj.DataType() == schema.AnySectionDataType.LlmMetadataProto:
-          f.seek(sec_obj.BeginOffset())
-          proto_data = f.read(sec_obj.EndOffset() - sec_obj.BeginOffset())
+        if data_type == schema.AnySectionDataType.LlmMetadataProto:
           llm_metadata = llm_metadata_pb2.LlmMetadata()
-          llm_metadata.ParseFromString(proto_data)
-          output_stream.write(
-              f"{' ' * INDENT_SPACES}<<<<<<<< start of LlmMetadata\n"
-          )
+          llm_metadata.ParseFromString(mm[begin:end])
+          out.write(f"{indent1}<<<<<<<< start of LlmMetadata\n")
           debug_str = text_format.MessageToString(llm_metadata)
-          for line in debug_str.splitlines():
-            output_stream.write(f"{' ' * (INDENT_SPACES * 2)}{line}\n")
-          output_stream.write(
-              f"{' ' * INDENT_SPACES}>>>>>>>> end of LlmMetadata\n"
+          out.writelines(
+              f"{indent2}{line}\n" for line in debug_str.splitlines()
           )
-        output_stream.write("\n")
+          out.write(f"{indent1}>>>>>>>> end of LlmMetadata\n")
+        out.write("\n")
+
+  output_stream.write(out.getvalue())
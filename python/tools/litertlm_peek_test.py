@@ -94,6 +94,38 @@ class LitertlmPeekPyTest(absltest.TestCase):
     self.assertIn("SP_Tokenizer", stdout)
     self.assertIn("TFLiteModel", stdout)
 
+  def test_process_litertlm_file_empty(self):
+    """Tests that an empty file is rejected as not a LiteRT-LM file."""
+    test_data_path = self.create_tempfile("empty.litertlm", b"").full_path
+    with self.assertRaisesRegex(ValueError, "Invalid magic number: b''"):
+      litertlm_peek.peek_litertlm_file(test_data_path, io.StringIO())
+
+  def test_process_litertlm_file_truncated(self):
+    """Tests that a file cut off within the header prefix is rejected."""
+    test_data_path = self.create_tempfile(
+        "truncated.litertlm", b"LITERTLM\x01\x00\x00\x00"
+    ).full_path
+    with self.assertRaisesRegex(ValueError, "too short"):
+      litertlm_peek.peek_litertlm_file(test_data_path, io.StringIO())
+
+  def test_process_litertlm_file_corrupt_header_end_offset(self):
+    """Tests that a header end offset inside the file prefix is rejected."""
+    with open(
+        os.path.join(
+            os.environ.get("TEST_SRCDIR", ""),
+            "litert_lm/schema/testdata/test_tokenizer_tflite.litertlm",
+        ),
+        "rb",
+    ) as f:
+      content = bytearray(f.read())
+    for header_end_offset in (0, 20):
+      content[24:32] = header_end_offset.to_bytes(8, "little")
+      test_data_path = self.create_tempfile(
+          f"corrupt_{header_end_offset}.litertlm", bytes(content)
+      ).full_path
+      with self.assertRaisesRegex(ValueError, "Header end offset"):
+        litertlm_peek.peek_litertlm_file(test_data_path, io.StringIO())
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -19,7 +19,16 @@ structure with a header and data sections, and writes the final binary file
 to disk.
 """
 
-from typing import Dict, List, Tuple
+import ctypes
+import errno
+import functools
+import os
+import re
+import stat
+import struct
+import sys
+import types
+from typing import List, Mapping, Sequence, Tuple
 import zlib
 import flatbuffers
 from google.protobuf import text_format
@@ -31,13 +40,57 @@ INT64_MAX = 9223372036854775807
 
 INT64_MIN = -9223372036854775808
 
+_INT_RE = re.compile(r"[+-]?[0-9]+")
+_FLOAT_RE = re.compile(r"[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?")
+_DIGIT_RE = re.compile(r"\d")
+# Digit-free strings that float() still accepts.
+_FLOAT_WORDS = frozenset(
+    sign + word
+    for sign in ("", "+", "-")
+    for word in ("inf", "infinity", "nan")
+)
+
+# Parsed form of an empty section metadata string. Immutable, so it can be
+# shared by every caller.
+_EMPTY_METADATA: Tuple[Tuple[str, Mapping[str, object]], ...] = ()
+
+# Chunk size used when streaming input files, and the output buffer size.
+_IO_BUFFER_SIZE = 1024 * 1024
+# Smallest input that is copied with os.sendfile rather than through the
+# output buffer.
+_SENDFILE_MIN_SIZE = 64 * 1024
+
+# Shared source of zero bytes for block padding.
+_ZERO_BLOCK = memoryview(bytes(litertlm_core.BLOCK_SIZE))
+
+# Magic bytes followed by the major, minor and patch version.
+_HEADER_PREFIX = struct.pack(
+    "<8sIII",
+    b"LITERTLM",
+    litertlm_core.LITERTLM_MAJOR_VERSION,
+    litertlm_core.LITERTLM_MINOR_VERSION,
+    litertlm_core.LITERTLM_PATCH_VERSION,
+)
+_UINT64_STRUCT = struct.Struct("<Q")
+
 
 def _parse_metadata_value(value_str):
   """Converts a string from metadata into a bool, int, float, or string."""
-  if value_str.lower() == "true":
+  lowered = value_str.lower()
+  if lowered == "true":
     return True
-  if value_str.lower() == "false":
+  if lowered == "false":
     return False
+  # Fast paths for plain numbers and for strings that cannot be numbers, so
+  # the common cases do not pay for raising and catching ValueError.
+  if _INT_RE.fullmatch(value_str):
+    return int(value_str)
+  if _FLOAT_RE.fullmatch(value_str):
+    return float(value_str)
+  if not _DIGIT_RE.search(value_str) and lowered.strip() not in _FLOAT_WORDS:
+    return value_str
+  # Anything else (whitespace, underscores, non-ASCII digits, ...) follows
+  # the int()/float() parsing rules.
   try:
     return int(value_str)
   except ValueError:
@@ -49,9 +102,33 @@ def _parse_metadata_value(value_str):
   return value_str
 
 
-def create_key_value_pair(builder, key, value):
-  """Creates a FlatBuffers KeyValuePair."""
-  key_offset = builder.CreateString(key)
+def _create_string(builder, s, string_cache):
+  """Creates a FlatBuffers string, reusing a cached offset when available."""
+  if string_cache is None:
+    return builder.CreateString(s)
+  offset = string_cache.get(s)
+  if offset is None:
+    offset = builder.CreateString(s)
+    string_cache[s] = offset
+  return offset
+
+
+def create_key_value_pair(builder, key, value, string_cache=None):
+  """Creates a FlatBuffers KeyValuePair.
+
+  Args:
+    builder: The FlatBuffers builder.
+    key: The key of the pair.
+    value: The value of the pair, a bool, int, float or string.
+    string_cache: Optional dict from string to the offset of that string in
+      `builder`. When given, keys and string values that were already written
+      are referenced instead of being serialized again. It must only be used
+      with a single builder.
+
+  Returns:
+    The offset of the KeyValuePair in `builder`.
+  """
+  key_offset = _create_string(builder, key, string_cache)
 
   # 1. Create the inner value object FIRST.
   if isinstance(value, bool):
@@ -72,7 +149,7 @@ def create_key_value_pair(builder, key, value):
     value_offset = schema.DoubleEnd(builder)
     value_type = schema.VData.Double
   else:  # Default to string
-    value_offset_str = builder.CreateString(str(value))
+    value_offset_str = _create_string(builder, str(value), string_cache)
     schema.StringValueStart(builder)
     schema.StringValueAddValue(builder, value_offset_str)
     value_offset = schema.StringValueEnd(builder)
@@ -87,58 +164,338 @@ def create_key_value_pair(builder, key, value):
   return schema.KeyValuePairEnd(builder)
 
 
+def _create_offset_vector(builder, start_vector, offsets):
+  """Creates a FlatBuffers vector of table offsets.
+
+  Args:
+    builder: The FlatBuffers builder.
+    start_vector: The generated StartXVector function for the vector field.
+    offsets: The offsets of the tables, in vector order.
+
+  Returns:
+    The offset of the vector in `builder`.
+  """
+  start_vector(builder, len(offsets))
+  # FlatBuffers vectors are built back to front.
+  prepend = builder.PrependUOffsetTRelative
+  for offset in reversed(offsets):
+    prepend(offset)
+  return builder.EndVector()
+
+
+@functools.lru_cache(maxsize=128)
 def parse_metadata_string(
     metadata_str: str,
-) -> List[Tuple[str, Dict[str, object]]]:
+) -> Tuple[Tuple[str, Mapping[str, object]], ...]:
   """Parses the section_metadata string into a dictionary.
 
+  Results are memoized per metadata string, so they are returned as
+  immutable tuples and read-only mappings that are safe to share between
+  callers.
+
   Args:
     metadata_str: A string containing metadata for each section. The
       format is:
       "section_name1:key1=value1,key2=value2;section_name2:key3=value3"
 
   Returns:
-    A list of tuples, where each tuple contains:
+    A tuple of tuples, where each tuple contains:
       - The section name (str).
-      - A dictionary containing the key-value pairs for that section (dict).
+      - A read-only mapping of the key-value pairs for that section.
 
   Raises:
     ValueError: If the metadata string is not in the correct format.
   """
-  metadata_keyvaluepairs = []
   if not metadata_str:
-    return metadata_keyvaluepairs
+    return _EMPTY_METADATA
 
-  for section_part in metadata_str.split(";"):
-    if not section_part:
+  metadata_keyvaluepairs = []
+
+  # Scan with str.find so that only the final names, keys and values are
+  # materialized as new strings.
+  end = len(metadata_str)
+  i = 0
+  while i < end:
+    section_end = metadata_str.find(";", i)
+    if section_end < 0:
+      section_end = end
+    if section_end == i:  # Skip empty sections.
+      i += 1
       continue
-    parts = section_part.split(":", 1)
-    if len(parts) != 2:
-      raise ValueError(f"Invalid section metadata format: {section_part}")
-    section_name, kv_pairs_str = parts
+    colon = metadata_str.find(":", i, section_end)
+    if colon < 0:
+      raise ValueError(
+          "Invalid section metadata format:"
+          f" {metadata_str[i:section_end]}"
+      )
+    section_name = metadata_str[i:colon]
     kv_dict = {}
-    if kv_pairs_str:
-      for kv_str in kv_pairs_str.split(","):
-        if "=" not in kv_str:
-          raise ValueError(f"Invalid key-value pair: {kv_str}")
-        key, value_str = kv_str.split("=", 1)
+    j = colon + 1
+    if j < section_end:
+      while True:
+        kv_end = metadata_str.find(",", j, section_end)
+        if kv_end < 0:
+          kv_end = section_end
+        eq = metadata_str.find("=", j, kv_end)
+        if eq < 0:
+          raise ValueError(f"Invalid key-value pair: {metadata_str[j:kv_end]}")
+        key = metadata_str[j:eq]
         if key in kv_dict:
           raise ValueError(f"Duplicate key in section metadata: {key}")
-        kv_dict[key] = _parse_metadata_value(value_str)
-    metadata_keyvaluepairs.append((section_name, kv_dict))
-  return metadata_keyvaluepairs
+        kv_dict[key] = _parse_metadata_value(metadata_str[eq + 1 : kv_end])
+        if kv_end == section_end:
+          break
+        j = kv_end + 1
+    metadata_keyvaluepairs.append(
+        (section_name, types.MappingProxyType(kv_dict))
+    )
+    i = section_end + 1
+  return tuple(metadata_keyvaluepairs)
+
+
+@functools.lru_cache(maxsize=64)
+def _serialize_text_llm_metadata(path, mtime_ns, size):
+  """Parses a text format LlmMetadata file and returns it serialized.
+
+  text_format.Parse is slow, so results are memoized. The modification time
+  and size are part of the cache key so that a file that changed on disk is
+  parsed again.
+
+  Args:
+    path: The absolute path of the text format LlmMetadata file.
+    mtime_ns: The modification time of the file, in nanoseconds.
+    size: The size of the file, in bytes.
+
+  Returns:
+    The binary serialized LlmMetadata.
+  """
+  del mtime_ns, size  # Only used as part of the cache key.
+  with open(path, "rb") as in_f:
+    content = in_f.read()
+  metadata = llm_metadata_pb2.LlmMetadata()
+  text_format.Parse(content.decode("utf-8"), metadata)
+  return metadata.SerializeToString()
+
+
+def _block_align(offset):
+  """Rounds `offset` up to a multiple of litertlm_core.BLOCK_SIZE."""
+  return -(-offset // litertlm_core.BLOCK_SIZE) * litertlm_core.BLOCK_SIZE
+
+
+def _load_fallocate():
+  """Returns libc's fallocate(2), or None where it is not available."""
+  if not sys.platform.startswith("linux"):
+    return None
+  try:
+    libc = ctypes.CDLL(None, use_errno=True)
+  except OSError:
+    return None
+  # fallocate64 takes a 64-bit off_t on every architecture; plain fallocate
+  # only does on 64-bit ones.
+  fallocate = getattr(libc, "fallocate64", None)
+  if fallocate is None and ctypes.sizeof(ctypes.c_void_p) == 8:
+    fallocate = getattr(libc, "fallocate", None)
+  if fallocate is None:
+    return None
+  fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64,
+                        ctypes.c_int64]
+  fallocate.restype = ctypes.c_int
+  return fallocate
+
+
+_FALLOCATE = _load_fallocate()
+
+# fallocate(2) errors meaning the file or filesystem cannot preallocate, so
+# the write simply proceeds without it.
+_FALLOCATE_UNSUPPORTED_ERRNOS = frozenset(
+    (errno.EOPNOTSUPP, errno.ENOSYS, errno.ENODEV)
+)
+
+
+def _preallocate(f, size):
+  """Reserves disk space for the first `size` bytes of `f`, if supported.
+
+  Preallocating lets the sequential writes that follow land in
+  pre-reserved extents instead of extending the file on every write. This
+  also extends the file to `size` bytes.
+
+  The fallocate(2) syscall is used directly rather than posix_fallocate,
+  which on filesystems without fallocate support emulates it by writing to
+  every block of the file. Preallocation is skipped where it is not
+  supported.
+
+  Args:
+    f: The output file object, opened for binary writing.
+    size: The number of bytes to reserve.
+
+  Raises:
+    OSError: If the space cannot be reserved, e.g. the disk is full.
+  """
+  if _FALLOCATE is None:
+    return
+  while _FALLOCATE(f.fileno(), 0, 0, size) != 0:
+    err = ctypes.get_errno()
+    if err == errno.EINTR:
+      continue
+    if err in _FALLOCATE_UNSUPPORTED_ERRNOS:
+      return
+    raise OSError(err, os.strerror(err))
 
 
 def write_padding(f, block_size):
-  """Writes zero padding to align to the next block size."""
-  current_pos = f.tell()
-  padding_needed = (block_size - (current_pos % block_size)) % block_size
-  if padding_needed > 0:
-    f.write(b"\0" * padding_needed)
+  """Writes zero padding to align to the next block size.
+
+  Args:
+    f: The output file object.
+    block_size: The alignment, in bytes.
+  """
+  padding_needed = -f.tell() % block_size
+  if padding_needed > len(_ZERO_BLOCK):
+    f.write(bytes(padding_needed))
+  elif padding_needed:
+    f.write(_ZERO_BLOCK[:padding_needed])
+
+
+def _skip_to_block_boundary(f):
+  """Seeks `f` forward to the next multiple of litertlm_core.BLOCK_SIZE.
+
+  This stands in for `write_padding` in `litertlm_write_parsed` for regular
+  files: the padding costs no I/O and can stay a hole on filesystems that
+  support sparse files. Seeking does not extend the file, so the caller must
+  extend it afterwards, e.g. with `truncate`.
+
+  Args:
+    f: The output file object, opened for binary writing and seekable.
+  """
+  padding_needed = -f.tell() & (litertlm_core.BLOCK_SIZE - 1)
+  if padding_needed:
+    f.seek(padding_needed, os.SEEK_CUR)
+
+
+def _read_chunks(in_f, buffer):
+  """Reads `in_f` into `buffer`, yielding a view of each chunk read.
+
+  Each view is only valid until the next chunk is read.
+
+  Args:
+    in_f: The input file object, opened for binary reading.
+    buffer: The writable buffer to read into, or None to allocate one.
+
+  Yields:
+    A memoryview of the bytes read in each chunk.
+  """
+  if buffer is None:
+    buffer = bytearray(_IO_BUFFER_SIZE)
+  view = memoryview(buffer)
+  while n := in_f.readinto(view):
+    yield view[:n]
+
+
+def copy_file_contents(f, in_f, buffer=None):
+  """Copies the contents of `in_f` to the current position of `f`.
+
+  Uses os.sendfile for large files where available so the data does not pass
+  through user space, and falls back to a buffered userspace copy otherwise.
+
+  Args:
+    f: The output file object, opened for binary writing and seekable.
+    in_f: The input file object, opened for binary reading.
+    buffer: Optional writable buffer reused for the userspace copy, so that
+      no memory is allocated per chunk.
+  """
+  size = os.fstat(in_f.fileno()).st_size
+  # sendfile needs the buffered output flushed first, which is only worth it
+  # for large payloads; small ones are cheaper to copy through the buffer.
+  if size >= _SENDFILE_MIN_SIZE and hasattr(os, "sendfile"):
+    # Flush pending buffered writes so the kernel file position is current.
+    f.flush()
+    start_pos = f.tell()
+    offset = 0
+    try:
+      while offset < size:
+        sent = os.sendfile(f.fileno(), in_f.fileno(), offset, size - offset)
+        if sent == 0:
+          break
+        offset += sent
+    except OSError:
+      # sendfile is not supported for this pair of files; nothing has been
+      # written yet, so fall back to the userspace copy below.
+      if offset:
+        raise
+    else:
+      # Re-sync the buffered writer with the file position advanced by the
+      # kernel.
+      f.seek(start_pos + offset)
+      return
+  write = f.write
+  for chunk in _read_chunks(in_f, buffer):
+    write(chunk)
+
+
+def _fast_zlib():
+  """Returns a SIMD-accelerated zlib-compatible module, if one is installed.
+
+  ISA-L is preferred over zlib-ng. Falls back to zlib if neither is
+  installed.
+  """
+  try:
+    # pylint: disable-next=g-import-not-at-top
+    from isal import isal_zlib  # pytype: disable=import-error
+
+    return isal_zlib
+  except ImportError:
+    pass
+  try:
+    # pylint: disable-next=g-import-not-at-top
+    from zlib_ng import zlib_ng  # pytype: disable=import-error
+
+    return zlib_ng
+  except ImportError:
+    return zlib
+
+
+def write_zlib_compressed(f, in_f, buffer=None, fast_compression=False):
+  """Writes the zlib-compressed contents of `in_f` to `f`.
+
+  The compressed data is prefixed with the uncompressed size as a
+  little-endian uint64. The input is streamed in chunks, so it is never held
+  in memory in full.
+
+  Args:
+    f: The output file object, opened for binary writing and seekable.
+    in_f: The input file object, opened for binary reading.
+    buffer: Optional writable buffer reused to read the input, so that no
+      memory is allocated per chunk.
+    fast_compression: Whether to compress with ISA-L or zlib-ng when one is
+      installed. This is faster, but the output depends on the installed
+      library and can be larger, so it is not reproducible. By default, zlib
+      is used.
+  """
+  zlib_module = _fast_zlib() if fast_compression else zlib
+  size_pos = f.tell()
+  # Write the size from the file metadata up front. It only needs patching
+  # (which flushes the buffered output) if the file changed while reading.
+  expected_size = os.fstat(in_f.fileno()).st_size
+  f.write(_UINT64_STRUCT.pack(expected_size))
+  compressor = zlib_module.compressobj()
+  write, compress = f.write, compressor.compress
+  uncompressed_size = 0
+  for chunk in _read_chunks(in_f, buffer):
+    uncompressed_size += len(chunk)
+    write(compress(chunk))
+  write(compressor.flush())
+  if uncompressed_size != expected_size:
+    end_pos = f.tell()
+    f.seek(size_pos)
+    f.write(_UINT64_STRUCT.pack(uncompressed_size))
+    f.seek(end_pos)
 
 
 def litertlm_write(
-    output_path: str, input_files: List[str], section_metadata_str: str
+    output_path: str,
+    input_files: List[str],
+    section_metadata_str: str,
+    fast_compression: bool = False,
 ):
   """Writes the LiteRT-LM file.
 
@@ -154,6 +511,43 @@ def litertlm_write(
     section_metadata_str: A string containing metadata for each section. The
       format is:
       "section_name1:key1=value1,key2=value2;section_name2:key3=value3"
+    fast_compression: Whether to compress HF tokenizers with ISA-L or zlib-ng
+      when one is installed, see `write_zlib_compressed`. The output file is
+      then not reproducible.
+
+  Raises:
+    ValueError: If no input files are provided or header size exceeds limit.
+  """
+  if not input_files:
+    raise ValueError("At least one input file must be provided.")
+
+  litertlm_write_parsed(
+      output_path,
+      input_files,
+      parse_metadata_string(section_metadata_str),
+      fast_compression,
+  )
+
+
+def litertlm_write_parsed(
+    output_path: str,
+    input_files: List[str],
+    metadata_keyvaluepairs: Sequence[Tuple[str, Mapping[str, object]]],
+    fast_compression: bool = False,
+):
+  """Writes the LiteRT-LM file from already parsed section metadata.
+
+  This is the same as `litertlm_write`, for callers that have already parsed
+  the section metadata with `parse_metadata_string`.
+
+  Args:
+    output_path: The path to the output LiteRT-LM file.
+    input_files: A list of input file paths.
+    metadata_keyvaluepairs: The section metadata, as returned by
+      `parse_metadata_string`.
+    fast_compression: Whether to compress HF tokenizers with ISA-L or zlib-ng
+      when one is installed, see `write_zlib_compressed`. The output file is
+      then not reproducible.
 
   Raises:
     ValueError: If no input files are provided or header size exceeds limit.
@@ -161,64 +555,107 @@ def litertlm_write(
   if not input_files:
     raise ValueError("At least one input file must be provided.")
 
-  metadata_keyvaluepairs = parse_metadata_string(section_metadata_str)
+  # Validate the inputs before creating the output file, so that a bad input
+  # does not leave a partially written file behind. Every input is stat'ed
+  # once; the results are reused below.
+  input_stats = [os.stat(filename) for filename in input_files]
+  section_types = []
+  for i, filename in enumerate(input_files):
+    section_type, section_name = litertlm_core.get_section_type_and_name(
+        filename
+    )
+    if i < len(metadata_keyvaluepairs):
+      meta_section_name = metadata_keyvaluepairs[i][0]
+      if meta_section_name != section_name:
+        raise ValueError(
+            f"Metadata section name '{meta_section_name}' does not match"
+            f" input file section name '{section_name}' at index {i}."
+        )
+    section_types.append(section_type)
+
+  # Every section starts on a block boundary after the header block. Text
+  # protos and compressed tokenizers are estimated by their input size.
+  expected_size = litertlm_core.BLOCK_SIZE + sum(
+      _block_align(input_stat.st_size) for input_stat in input_stats
+  )
+
+  with open(output_path, "wb", buffering=_IO_BUFFER_SIZE) as f:
+    _preallocate(f, expected_size)
+
+    # Padding is skipped over and the file size set with a final truncate.
+    # Outputs that are not regular files (e.g. /dev/null) cannot be
+    # truncated, so their padding is written out instead.
+    is_regular_file = stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+    if is_regular_file:
+      pad = _skip_to_block_boundary
+    else:
+      pad = functools.partial(
+          write_padding, block_size=litertlm_core.BLOCK_SIZE
+      )
 
-  with open(output_path, "wb") as f:
     # 0. Write magic bytes and version
-    f.write(b"LITERTLM")
-    f.write(litertlm_core.LITERTLM_MAJOR_VERSION.to_bytes(4, "little"))
-    f.write(litertlm_core.LITERTLM_MINOR_VERSION.to_bytes(4, "little"))
-    f.write(litertlm_core.LITERTLM_PATCH_VERSION.to_bytes(4, "little"))
+    f.write(_HEADER_PREFIX)
 
     # 1. Write zero pad until offset BLOCK_SIZE
-    write_padding(f, litertlm_core.BLOCK_SIZE)
+    pad(f)
 
     # 2. Write the sections
+    # One buffer is shared by all sections that are streamed in userspace.
+    buffer = bytearray(_IO_BUFFER_SIZE)
     section_offsets = []
-    section_types = []
-    section_names = []
-
-    for filename in input_files:
-      section_type, section_name = litertlm_core.get_section_type_and_name(
-          filename
-      )
-      section_types.append(section_type)
-      section_names.append(section_name)
 
+    for filename, input_stat, section_type in zip(
+        input_files, input_stats, section_types
+    ):
       start_offset = f.tell()
-      with open(filename, "rb") as in_f:
-        content = in_f.read()
-        if section_type == schema.AnySectionDataType.LlmMetadataProto:
-          ext = litertlm_core.get_file_extension(filename)
-          if ext in (".pbtext", ".prototext"):
-            metadata = llm_metadata_pb2.LlmMetadata()
-            text_format.Parse(content.decode("utf-8"), metadata)
-            f.write(metadata.SerializeToString())
+      ext = litertlm_core.get_file_extension(filename)
+      if section_type == schema.AnySectionDataType.LlmMetadataProto and (
+          ext in (".pbtext", ".prototext")
+      ):
+        f.write(
+            _serialize_text_llm_metadata(
+                os.path.abspath(filename),
+                input_stat.st_mtime_ns,
+                input_stat.st_size,
+            )
+        )
+      else:
+        # Inputs are read in large chunks, so they are opened unbuffered.
+        with open(filename, "rb", buffering=0) as in_f:
+          if section_type == schema.AnySectionDataType.HF_Tokenizer_Zlib:
+            write_zlib_compressed(f, in_f, buffer, fast_compression)
           else:
-            f.write(content)
-        elif section_type == schema.AnySectionDataType.HF_Tokenizer_Zlib:
-          uncompressed_size = len(content)
-          compressed_content = zlib.compress(content)
-          f.write(uncompressed_size.to_bytes(8, "little"))
-          f.write(compressed_content)
-        else:
-          f.write(content)
+            copy_file_contents(f, in_f, buffer)
 
       end_offset = f.tell()
       section_offsets.append((start_offset, end_offset))
-      write_padding(f, litertlm_core.BLOCK_SIZE)
+      pad(f)
+    file_end = f.tell()
 
     # 3. Write the header
-    builder = flatbuffers.Builder(1024)
+    # Size the builder for the expected header so it does not have to grow
+    # (and copy itself) while sections are added. The header cannot exceed
+    # BLOCK_SIZE, so neither does the initial size.
+    num_kv_pairs = 1 + sum(len(kv) for _, kv in metadata_keyvaluepairs)
+    builder = flatbuffers.Builder(
+        min(
+            2048 + 256 * len(input_files) + 96 * num_kv_pairs,
+            litertlm_core.BLOCK_SIZE,
+        )
+    )
+
+    # Keys and string values repeated across sections are serialized once.
+    string_cache = {}
 
     # System Metadata
     system_kv_pairs = [
-        create_key_value_pair(builder, "author", "The ODML Authors")
+        create_key_value_pair(
+            builder, "author", "The ODML Authors", string_cache
+        )
     ]
-    schema.SystemMetadataStartEntriesVector(builder, len(system_kv_pairs))
-    for kv in reversed(system_kv_pairs):
-      builder.PrependUOffsetTRelative(kv)
-    entries_vec = builder.EndVector()
+    entries_vec = _create_offset_vector(
+        builder, schema.SystemMetadataStartEntriesVector, system_kv_pairs
+    )
     schema.SystemMetadataStart(builder)
     schema.SystemMetadataAddEntries(builder, entries_vec)
     system_metadata_offset = schema.SystemMetadataEnd(builder)
@@ -226,22 +663,17 @@ def litertlm_write(
     # Section Metadata
     section_objects = []
     for i, (start, end) in enumerate(section_offsets):
-      section_name = section_names[i]
       section_kv_pairs = []
-      if metadata_keyvaluepairs and i < len(metadata_keyvaluepairs):
-        meta_section_name, kv_dict = metadata_keyvaluepairs[i]
-        if meta_section_name != section_name:
-          raise ValueError(
-              f"Metadata section name '{meta_section_name}' does not match"
-              f" input file section name '{section_name}' at index {i}."
-          )
+      if i < len(metadata_keyvaluepairs):
+        _, kv_dict = metadata_keyvaluepairs[i]
         for key, value in kv_dict.items():
-          section_kv_pairs.append(create_key_value_pair(builder, key, value))
+          section_kv_pairs.append(
+              create_key_value_pair(builder, key, value, string_cache)
+          )
 
-      schema.SectionObjectStartItemsVector(builder, len(section_kv_pairs))
-      for kv in reversed(section_kv_pairs):
-        builder.PrependUOffsetTRelative(kv)
-      items_vec = builder.EndVector()
+      items_vec = _create_offset_vector(
+          builder, schema.SectionObjectStartItemsVector, section_kv_pairs
+      )
 
       schema.SectionObjectStart(builder)
       schema.SectionObjectAddItems(builder, items_vec)
@@ -250,10 +682,9 @@ def litertlm_write(
       schema.SectionObjectAddDataType(builder, section_types[i])
       section_objects.append(schema.SectionObjectEnd(builder))
 
-    schema.SectionMetadataStartObjectsVector(builder, len(section_objects))
-    for obj in reversed(section_objects):
-      builder.PrependUOffsetTRelative(obj)
-    objects_vec = builder.EndVector()
+    objects_vec = _create_offset_vector(
+        builder, schema.SectionMetadataStartObjectsVector, section_objects
+    )
 
     schema.SectionMetadataStart(builder)
     schema.SectionMetadataAddObjects(builder, objects_vec)
@@ -277,4 +708,10 @@ def litertlm_write(
 
     # 5. Finally, write the header end offset
     f.seek(litertlm_core.HEADER_END_LOCATION_BYTE_OFFSET)
-    f.write(header_end_offset.to_bytes(8, "little"))
+    f.write(_UINT64_STRUCT.pack(header_end_offset))
+
+    # Set the file size to the end of the last section's padding. This drops
+    # any excess preallocated space, and extends the file if it ends in
+    # padding that was skipped over.
+    if is_regular_file:
+      f.truncate(file_end)
@@ -30,48 +30,136 @@ specified in the section_metadata argument.
 """
 
 import argparse
+import sys
+
 from litert_lm.python.tools import litertlm_writer
 
 
-def main():
-  """Parses command-line arguments and runs the litertlm_writer tool."""
+# The flags of the tool, as `add_argument` keyword arguments by flag name.
+# Both the argparse parser and `_parse_args_fast` are derived from this, so
+# they accept the same flags with the same defaults.
+_FLAGS = {
+    "--output_path": dict(
+        type=str,
+        required=True,
+        help="The path for the output LiteRT-LM file.",
+    ),
+    "--section_metadata": dict(
+        type=str,
+        default="",
+        help=(
+            "Metadata for sections in the format "
+            "'section_name:key1=value1,key2=value2;...'."
+        ),
+    ),
+    "--fast_compression": dict(
+        action="store_true",
+        help=(
+            "Compress HF tokenizers with ISA-L or zlib-ng when installed."
+            " Faster, but the output is not reproducible."
+        ),
+    ),
+}
+
+
+def _build_parser():
+  """Builds the command-line argument parser."""
   parser = argparse.ArgumentParser(
       description="Create a LiteRT-LM file from input files and metadata."
   )
-  parser.add_argument(
-      "--output_path",
-      type=str,
-      required=True,
-      help="The path for the output LiteRT-LM file.",
-  )
-  parser.add_argument(
-      "--section_metadata",
-      type=str,
-      default="",
-      help=(
-          "Metadata for sections in the format "
-          "'section_name:key1=value1,key2=value2;...'."
-      ),
-  )
+  for name, kwargs in _FLAGS.items():
+    parser.add_argument(name, **kwargs)
   parser.add_argument(
       "input_files",
       nargs="+",
       help="Paths to the input files (e.g., tokenizer, model).",
   )
+  return parser
+
 
-  args = parser.parse_args()
+def _parse_args_fast(argv):
+  """Parses the common command-line form without building an argparse parser.
+
+  Only flags from `_FLAGS` given as `--flag=value` (or just `--flag` for
+  `store_true` flags) and positional input files are recognized. Flags that
+  are not given get the same defaults as with the argparse parser.
+
+  Args:
+    argv: The command-line arguments, without the program name.
+
+  Returns:
+    The parsed arguments, or None if `argv` uses any other form (e.g. --help,
+    or a flag value given as a separate argument) or is incomplete, in which
+    case it should be parsed with argparse instead.
+  """
+  values = {}
+  input_files = []
+  after_input_files = False
+  for arg in argv:
+    name, has_value, value = arg.partition("=")
+    kwargs = _FLAGS.get(name)
+    if kwargs is not None and arg.startswith("--"):
+      action = kwargs.get("action")
+      if action is None and has_value:
+        try:
+          values[name] = kwargs.get("type", str)(value)
+        except (TypeError, ValueError):
+          return None
+      elif action == "store_true" and not has_value:
+        values[name] = True
+      else:
+        return None
+    elif arg.startswith("-") and arg != "-":
+      return None
+    elif after_input_files:
+      # argparse requires the input files to be given as one group.
+      return None
+    else:
+      input_files.append(arg)
+      continue
+    after_input_files = bool(input_files)
+  if not input_files:
+    return None
+
+  args = argparse.Namespace()
+  for name, kwargs in _FLAGS.items():
+    if name in values:
+      value = values[name]
+    elif kwargs.get("required"):
+      return None
+    elif kwargs.get("action") == "store_true":
+      value = kwargs.get("default", False)
+    else:
+      value = kwargs.get("default")
+    setattr(args, name[2:].replace("-", "_"), value)
+  args.input_files = input_files
+  return args
+
+
+def main():
+  """Parses command-line arguments and runs the litertlm_writer tool."""
+  # argparse is only needed for help, errors and less common flag forms.
+  args = _parse_args_fast(sys.argv[1:])
+  if args is None:
+    args = _build_parser().parse_args()
 
   try:
-    litertlm_writer.litertlm_write(
-        args.output_path, args.input_files, args.section_metadata
+    metadata_keyvaluepairs = litertlm_writer.parse_metadata_string(
+        args.section_metadata
+    )
+    litertlm_writer.litertlm_write_parsed(
+        args.output_path,
+        args.input_files,
+        metadata_keyvaluepairs,
+        args.fast_compression,
     )
     print(
         "🎂 LiteRT-LM file successfully created! Output is at"
         f" {args.output_path}"
     )
   except (ValueError, FileNotFoundError) as e:
-    print(f"Error creating LiteRT-LM file: {e}")
-    exit(1)
+    print(f"Error creating LiteRT-LM file: {e}", file=sys.stderr)
+    sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+# Copyright 2025 The ODML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the litertlm_writer_main command-line tool."""
+
+import contextlib
+import io
+import os
+import sys
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from litert_lm.python.tools import litertlm_peek
+from litert_lm.python.tools import litertlm_writer
+from litert_lm.python.tools import litertlm_writer_main
+
+
+class LitertlmWriterMainTest(parameterized.TestCase):
+
+  @parameterized.parameters(
+      (["--output_path=out.litertlm", "model.tflite"],),
+      (["model.tflite", "--output_path=out.litertlm"],),
+      (["--output_path=", "model.tflite"],),
+      (["--output_path=a=b.litertlm", "-", "model.tflite"],),
+      ([
+          "--output_path=out.litertlm",
+          "tokenizer.spiece",
+          "model.tflite",
+          "--section_metadata=tokenizer:lang=en;tflite:size=1024",
+      ],),
+      ([
+          "--section_metadata=tflite:size=1",
+          "--output_path=first.litertlm",
+          "--output_path=out.litertlm",
+          "model.tflite",
+      ],),
+      (["--fast_compression", "--output_path=out.litertlm", "tokenizer.json"],),
+  )
+  def test_fast_path_matches_argparse(self, argv):
+    """Tests that the fast path parses the common form like argparse."""
+    fast_args = litertlm_writer_main._parse_args_fast(argv)
+    self.assertIsNotNone(fast_args)
+    self.assertEqual(
+        vars(fast_args),
+        vars(litertlm_writer_main._build_parser().parse_args(argv)),
+    )
+
+  @parameterized.parameters(
+      (["--output_path", "out.litertlm", "model.tflite"],),
+      (["--output=out.litertlm", "model.tflite"],),
+      (["--output_path=out.litertlm", "--", "model.tflite"],),
+  )
+  def test_fast_path_falls_back_to_argparse(self, argv):
+    """Tests that less common, valid forms are left to argparse."""
+    self.assertIsNone(litertlm_writer_main._parse_args_fast(argv))
+    args = litertlm_writer_main._build_parser().parse_args(argv)
+    self.assertEqual(args.output_path, "out.litertlm")
+    self.assertEqual(args.input_files, ["model.tflite"])
+
+  @parameterized.parameters(
+      (["-h"],),
+      (["--help"],),
+      ([],),
+      (["model.tflite"],),
+      (["--output_path=out.litertlm"],),
+      (["a.tflite", "--output_path=out.litertlm", "b.tflite"],),
+      (["--output_path=out.litertlm", "--unknown=1", "model.tflite"],),
+      (["--output_path=out.litertlm", "--fast_compression=1", "model.tflite"],),
+  )
+  def test_fast_path_leaves_help_and_errors_to_argparse(self, argv):
+    """Tests that help and invalid command lines are left to argparse."""
+    self.assertIsNone(litertlm_writer_main._parse_args_fast(argv))
+    # argparse prints the help or usage error before exiting.
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+        io.StringIO()
+    ), self.assertRaises(SystemExit):
+      litertlm_writer_main._build_parser().parse_args(argv)
+
+  def _run_main(self, argv):
+    """Runs main() with `argv`, returning its exit code, stdout and stderr."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code = 0
+    with mock.patch.object(
+        sys, "argv", ["litertlm_writer_main"] + argv
+    ), contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+      try:
+        litertlm_writer_main.main()
+      except SystemExit as e:
+        exit_code = e.code
+    return exit_code, stdout.getvalue(), stderr.getvalue()
+
+  def test_main(self):
+    """Tests that main() writes the file from the parsed section metadata."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.litertlm")
+
+    with mock.patch.object(
+        litertlm_writer,
+        "litertlm_write_parsed",
+        wraps=litertlm_writer.litertlm_write_parsed,
+    ) as write_parsed:
+      exit_code, stdout, stderr = self._run_main([
+          f"--output_path={output_path}",
+          "--section_metadata=tflite:size=1024",
+          model_path,
+      ])
+
+    self.assertEqual(exit_code, 0)
+    write_parsed.assert_called_once_with(
+        output_path,
+        [model_path],
+        litertlm_writer.parse_metadata_string("tflite:size=1024"),
+        False,
+    )
+    self.assertIn(f"Output is at {output_path}", stdout)
+    self.assertEmpty(stderr)
+    output_stream = io.StringIO()
+    litertlm_peek.peek_litertlm_file(output_path, output_stream)
+    self.assertIn("Key: size, Value (Int64): 1024", output_stream.getvalue())
+
+  def test_main_section_name_mismatch(self):
+    """Tests that main() reports a bad section name on stderr and exits."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.litertlm")
+
+    exit_code, stdout, stderr = self._run_main([
+        f"--output_path={output_path}",
+        "--section_metadata=tokenizer:lang=en",
+        model_path,
+    ])
+
+    self.assertEqual(exit_code, 1)
+    self.assertEmpty(stdout)
+    self.assertRegex(
+        stderr,
+        "^Error creating LiteRT-LM file: Metadata section name 'tokenizer'"
+        " does not match",
+    )
+    self.assertFalse(os.path.exists(output_path))
+
+if __name__ == "__main__":
+  absltest.main()
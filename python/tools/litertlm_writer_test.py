@@ -11,16 +11,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import ctypes
+import errno
 import io
+import math
 import os
+from unittest import mock
+import zlib
 
 from absl.testing import absltest
+from absl.testing import parameterized
 
 from litert_lm.python.tools import litertlm_peek
 from litert_lm.python.tools import litertlm_writer
 
 
-class LitertlmWriterPyTest(absltest.TestCase):
+class LitertlmWriterPyTest(parameterized.TestCase):
 
   def test_litertlm_write(self):
     # Create dummy input files.
@@ -56,6 +62,8 @@ class LitertlmWriterPyTest(absltest.TestCase):
     # These following offset can verify the padding is correct.
     self.assertIn("Begin Offset: 16384", peek_output)
     self.assertIn("Begin Offset: 32768", peek_output)
+    # The file ends at the block boundary after the last section.
+    self.assertEqual(os.path.getsize(output_path), 3 * 16384)
 
   def test_litertlm_write_comprehensive(self):
     """Tests creation with all supported file types."""
@@ -203,6 +211,197 @@ class LitertlmWriterPyTest(absltest.TestCase):
     self.assertIn("<None>", tflite_section)
     self.assertNotIn("Key:", tflite_section)
 
+  def _compress(self, content, **kwargs):
+    """Returns the output of write_zlib_compressed for `content`."""
+    input_path = self.create_tempfile("tokenizer.json", content).full_path
+    out = io.BytesIO()
+    with open(input_path, "rb") as in_f:
+      litertlm_writer.write_zlib_compressed(out, in_f, **kwargs)
+    return out.getvalue()
+
+  def test_write_zlib_compressed(self):
+    """Tests that streamed compression matches one-shot zlib compression."""
+    content = b'{"version": "1.0"}' * 100000
+    data = self._compress(content)
+    self.assertEqual(int.from_bytes(data[:8], "little"), len(content))
+    self.assertEqual(data[8:], zlib.compress(content))
+
+  def test_write_zlib_compressed_fast(self):
+    """Tests that fast compression produces a valid zlib stream."""
+    content = b'{"version": "1.0"}' * 100000
+    data = self._compress(content, fast_compression=True)
+    self.assertEqual(int.from_bytes(data[:8], "little"), len(content))
+    self.assertEqual(zlib.decompress(data[8:]), content)
+
+  def test_write_padding(self):
+    """Tests that padding is written as zeros up to the block boundary."""
+    out = io.BytesIO()
+    out.write(b"data")
+    litertlm_writer.write_padding(out, 16)
+    self.assertEqual(out.getvalue(), b"data" + bytes(12))
+    litertlm_writer.write_padding(out, 16)
+    self.assertEqual(out.getvalue(), b"data" + bytes(12))
+
+  def test_write_padding_any_block_size(self):
+    """Tests padding to block sizes that are not small powers of two."""
+    for position, block_size, expected_end in (
+        (10, 24, 24),
+        (24, 24, 24),
+        (4, 65536, 65536),
+        (4, 16384, 16384),
+        (16385, 16384, 32768),
+    ):
+      out = io.BytesIO()
+      out.write(b"x" * position)
+      litertlm_writer.write_padding(out, block_size)
+      self.assertEqual(out.tell(), expected_end)
+      self.assertEqual(
+          out.getvalue()[position:], bytes(expected_end - position)
+      )
+
+  def _copy_between_writes(self, content):
+    """Copies `content` via copy_file_contents between two buffered writes."""
+    input_path = self.create_tempfile("data.bin", content).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.bin")
+    with open(output_path, "wb") as f:
+      f.write(b"prefix")
+      with open(input_path, "rb") as in_f:
+        litertlm_writer.copy_file_contents(f, in_f)
+      f.write(b"suffix")
+    with open(output_path, "rb") as f:
+      return f.read()
+
+  def test_copy_file_contents(self):
+    """Tests that the copied data lands between the surrounding writes."""
+    content = os.urandom(3 * 1024 * 1024 + 7)
+    self.assertEqual(
+        self._copy_between_writes(content), b"prefix" + content + b"suffix"
+    )
+
+  def test_copy_file_contents_sendfile_unsupported(self):
+    """Tests the fallback copy when os.sendfile fails."""
+    content = os.urandom(3 * 1024 * 1024 + 7)
+    with mock.patch.object(
+        litertlm_writer.os, "sendfile", side_effect=OSError, create=True
+    ):
+      copied = self._copy_between_writes(content)
+    self.assertEqual(copied, b"prefix" + content + b"suffix")
+
+  def test_litertlm_write_parsed(self):
+    """Tests writing a file from already parsed section metadata."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.litertlm")
+
+    metadata = litertlm_writer.parse_metadata_string("tflite:size=1024")
+    litertlm_writer.litertlm_write_parsed(output_path, [model_path], metadata)
+
+    output_stream = io.StringIO()
+    litertlm_peek.peek_litertlm_file(output_path, output_stream)
+    peek_output = output_stream.getvalue()
+
+    self.assertIn("TFLiteModel", peek_output)
+    self.assertIn("Key: size, Value (Int64): 1024", peek_output)
+
+  def test_litertlm_write_shares_repeated_strings(self):
+    """Tests that repeated keys and values are serialized once."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    model_path_2 = self.create_tempfile(
+        "model_2.tflite", "Dummy model content 2"
+    ).full_path
+    input_files = [model_path, model_path_2]
+    metadata_str = (
+        "tflite:model_type=PREFILL_DECODE;tflite:model_type=PREFILL_DECODE"
+    )
+
+    def write(output_path):
+      litertlm_writer.litertlm_write(output_path, input_files, metadata_str)
+      with open(output_path, "rb") as f:
+        f.seek(24)
+        header_end_offset = int.from_bytes(f.read(8), "little")
+      output_stream = io.StringIO()
+      litertlm_peek.peek_litertlm_file(output_path, output_stream)
+      return header_end_offset, output_stream.getvalue()
+
+    tempdir = self.create_tempdir()
+    shared_header_end, shared_peek = write(
+        os.path.join(tempdir, "shared.litertlm")
+    )
+
+    create_key_value_pair = litertlm_writer.create_key_value_pair
+
+    def create_key_value_pair_uncached(builder, key, value, string_cache):
+      del string_cache  # Unused.
+      return create_key_value_pair(builder, key, value, None)
+
+    with mock.patch.object(
+        litertlm_writer,
+        "create_key_value_pair",
+        create_key_value_pair_uncached,
+    ):
+      unshared_header_end, unshared_peek = write(
+          os.path.join(tempdir, "unshared.litertlm")
+      )
+
+    self.assertLess(shared_header_end, unshared_header_end)
+    self.assertEqual(shared_peek, unshared_peek)
+    self.assertEqual(
+        shared_peek.count("Key: model_type, Value (String): PREFILL_DECODE"), 2
+    )
+
+  def test_litertlm_write_to_non_regular_file(self):
+    """Tests writing to an output that cannot be truncated."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    litertlm_writer.litertlm_write(os.devnull, [model_path], "")
+
+  def _fake_fallocate(self, err):
+    """Returns a stand-in for fallocate(2) that fails with `err`."""
+
+    def fallocate(fd, mode, offset, length):
+      del fd, mode, offset, length  # Unused.
+      ctypes.set_errno(err)
+      return -1
+
+    return fallocate
+
+  def test_litertlm_write_preallocation_unsupported(self):
+    """Tests that the file is written when fallocate is not supported."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.litertlm")
+
+    with mock.patch.object(
+        litertlm_writer,
+        "_FALLOCATE",
+        self._fake_fallocate(errno.EOPNOTSUPP),
+    ):
+      litertlm_writer.litertlm_write(output_path, [model_path], "")
+
+    output_stream = io.StringIO()
+    litertlm_peek.peek_litertlm_file(output_path, output_stream)
+    self.assertIn("Begin Offset: 16384", output_stream.getvalue())
+    self.assertEqual(os.path.getsize(output_path), 2 * 16384)
+
+  def test_litertlm_write_preallocation_out_of_space(self):
+    """Tests that running out of disk space while preallocating is raised."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.litertlm")
+
+    with mock.patch.object(
+        litertlm_writer, "_FALLOCATE", self._fake_fallocate(errno.ENOSPC)
+    ):
+      with self.assertRaises(OSError) as cm:
+        litertlm_writer.litertlm_write(output_path, [model_path], "")
+    self.assertEqual(cm.exception.errno, errno.ENOSPC)
+
   def test_empty_input_files(self):
     """Tests that an error is raised for empty input file list."""
     with self.assertRaisesRegex(ValueError, "At least one input file"):
@@ -216,6 +415,66 @@ class LitertlmWriterPyTest(absltest.TestCase):
           output_path, ["non_existent_file.tflite"], ""
       )
 
+  def test_invalid_input_creates_no_output(self):
+    """Tests that invalid inputs are rejected before the output is created."""
+    model_path = self.create_tempfile(
+        "model.tflite", "Dummy model content"
+    ).full_path
+    output_path = os.path.join(self.create_tempdir(), "output.litertlm")
+
+    with self.assertRaises(FileNotFoundError):
+      litertlm_writer.litertlm_write(
+          output_path, [model_path, "non_existent_file.tflite"], ""
+      )
+    self.assertFalse(os.path.exists(output_path))
+
+    with self.assertRaisesRegex(ValueError, "does not match"):
+      litertlm_writer.litertlm_write(
+          output_path, [model_path], "tokenizer:lang=en"
+      )
+    self.assertFalse(os.path.exists(output_path))
+
+  @parameterized.parameters(
+      ("1e5", 100000.0),
+      ("+.5", 0.5),
+      ("inf", math.inf),
+      (" -Infinity ", -math.inf),
+      ("1_000", 1000),
+      (" 12 ", 12),
+      ("\u0661\u0662", 12),  # Arabic-Indic digits.
+      ("-7", -7),
+      ("1.", 1.0),
+      ("tRuE", True),
+      ("FALSE", False),
+      ("abc", "abc"),
+      ("1e", "1e"),
+      ("1__0", "1__0"),
+      ("12abc", "12abc"),
+  )
+  def test_parse_metadata_value(self, value_str, expected):
+    """Tests that values are typed like bool, then int(), then float()."""
+    value = litertlm_writer._parse_metadata_value(value_str)
+    self.assertIs(type(value), type(expected))
+    self.assertEqual(value, expected)
+
+  def test_parse_metadata_value_nan(self):
+    """Tests that NaN is parsed as a float."""
+    value = litertlm_writer._parse_metadata_value("NaN")
+    self.assertIsInstance(value, float)
+    self.assertTrue(math.isnan(value))
+
+  def test_parse_metadata_string_is_memoized_and_read_only(self):
+    """Tests that parsed metadata is shared between calls and immutable."""
+    metadata_str = "tokenizer:lang=en;tflite:size=1024"
+    metadata = litertlm_writer.parse_metadata_string(metadata_str)
+    self.assertIs(litertlm_writer.parse_metadata_string(metadata_str), metadata)
+    self.assertEqual(
+        [(name, dict(kv)) for name, kv in metadata],
+        [("tokenizer", {"lang": "en"}), ("tflite", {"size": 1024})],
+    )
+    with self.assertRaises(TypeError):
+      metadata[0][1]["lang"] = "fr"
+
   def test_invalid_metadata_format_missing_colon(self):
     """Tests error handling for malformed metadata string."""
     with self.assertRaisesRegex(ValueError, "Invalid section metadata format"):
@@ -226,6 +485,29 @@ class LitertlmWriterPyTest(absltest.TestCase):
     with self.assertRaisesRegex(ValueError, "Invalid key-value pair"):
       litertlm_writer.parse_metadata_string("tokenizer:key_no_equals")
 
+  @parameterized.parameters(
+      (";;a:k=v;", [("a", {"k": "v"})]),
+      ("a:k=v;;", [("a", {"k": "v"})]),
+      ("a:k=v:w=x", [("a", {"k": "v:w=x"})]),
+      ("a:k==v", [("a", {"k": "=v"})]),
+      ("a:", [("a", {})]),
+      ("a:k=v;b:", [("a", {"k": "v"}), ("b", {})]),
+      ("a:k=", [("a", {"k": ""})]),
+      (" a : k = v ", [(" a ", {" k ": " v "})]),
+  )
+  def test_parse_metadata_string_boundaries(self, metadata_str, expected):
+    """Tests section and pair boundaries of the metadata format."""
+    parsed = litertlm_writer.parse_metadata_string(metadata_str)
+    self.assertEqual(
+        [(name, dict(kv_pairs)) for name, kv_pairs in parsed], expected
+    )
+
+  @parameterized.parameters("a:k=v,", "a:k=v,,j=1", "a:,k=v")
+  def test_invalid_metadata_format_empty_kv_pair(self, metadata_str):
+    """Tests that an empty key-value pair, e.g. a trailing comma, fails."""
+    with self.assertRaisesRegex(ValueError, "Invalid key-value pair"):
+      litertlm_writer.parse_metadata_string(metadata_str)
+
 
 if __name__ == "__main__":
   absltest.main()